@@ -1,23 +1,43 @@
 # agent_processor.py
 
 import os
+import shutil
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.output_parsers import PydanticOutputParser, StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, FewShotPromptTemplate, PromptTemplate
+
 import json
 import getpass
+import hashlib
+import threading
+
+from cancellation import CancelToken, JobCancelled, JobExpired, invoke_with_token
+from fidelity import FidelityReport, attempt_rank, check_fidelity, describe_failures
 
 if "GOOGLE_API_KEY" not in os.environ:
     os.environ["GOOGLE_API_KEY"] = getpass.getpass("Enter your Google AI API key: ")
 
+MODEL_NAME = "gemini-2.0-flash"
+INDEX_FILENAME = "index.json"
+
+_index_lock = threading.Lock()
+
 class ArticleOutput(BaseModel):
     markdown: str = Field(description="The article content converted to markdown format")
     json_metadata: dict = Field(description="Metadata about the article in JSON format")
     user_queries: List[str] = Field(default_factory=list, description="List of queries needed from the user")
 
+class ArticleMetadata(BaseModel):
+    id: str = Field(description="The id of the article this metadata belongs to")
+    title: str = Field(description="The article title in Arabic")
+    description: str = Field(description="A brief description of the article in Arabic")
+
+class MetadataBatch(BaseModel):
+    items: List[ArticleMetadata] = Field(description="Metadata for each article in the request")
+
 class Example(BaseModel):
     input: str
     markdown_output: str
@@ -61,8 +81,11 @@ def load_examples() -> List[Dict[str, Any]]:
     
     return examples
 
-def create_prompt_template(article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None) -> FewShotPromptTemplate:
-    """Create a FewShotPromptTemplate with example formatting."""
+def create_prompt_template(article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None, failed_check: Optional[FidelityReport] = None) -> FewShotPromptTemplate:
+    """
+    Create a FewShotPromptTemplate with example formatting.
+    failed_check is the fidelity report of a previous attempt, used on retries to point the model at what it dropped.
+    """
     
     # Define how each example should be formatted
     example_template = """
@@ -142,6 +165,16 @@ Remember:
 
 Provide the markdown content and JSON metadata in the required format."""
 
+    if failed_check is not None:
+        reasons = describe_failures(failed_check) or ["some content was left out"]
+        suffix += "\n\nA previous conversion of this article was truncated: " + "; ".join(reasons) + "."
+        suffix += "\nKeep the full article with the same words, details, and context length."
+        if failed_check.dropped_paragraphs:
+            suffix += "\nMake sure to include these paragraphs:"
+            for paragraph in failed_check.dropped_paragraphs:
+                # Escape braces so the paragraph isn't read as a template variable
+                suffix += "\n- " + paragraph.replace("{", "{{").replace("}", "}}")
+
     examples = load_examples()
     
     # Create the FewShotPromptTemplate
@@ -156,24 +189,69 @@ Provide the markdown content and JSON metadata in the required format."""
     
     return few_shot_prompt
 
-def process_article(article_text: str, article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None) -> ArticleOutput:
-    """Process an article using few-shot learning approach."""
+def prompt_version(model: str = MODEL_NAME) -> str:
+    """
+    Hash of the prompt instructions, the example set and the model.
+    Outputs saved under a different version are stale.
+    """
+    few_shot_prompt = create_prompt_template()
+    payload = json.dumps({
+        "prefix": few_shot_prompt.prefix,
+        "suffix": few_shot_prompt.suffix,
+        "example_template": few_shot_prompt.example_prompt.template,
+        "examples": few_shot_prompt.examples,
+        "model": model
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def invoke_article_model(article_text: str, article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None, llm: Optional[Any] = None, cancel_token: Optional[CancelToken] = None, failed_check: Optional[FidelityReport] = None) -> str:
+    """
+    Network-bound half of processing: run the few-shot prompt through the model and return the raw response text.
+    A custom llm (any runnable or callable taking the prompt) can be passed, e.g. a fake model for testing.
+    If a cancel_token is given, the request is aborted with JobCancelled/JobExpired when it stops.
+    """
     # Initialize the LLM
-    llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash")
+    if llm is None:
+        llm = ChatGoogleGenerativeAI(model=MODEL_NAME)
     
     # Create the prompt template with metadata
-    few_shot_prompt = create_prompt_template(article_date, filename, author)
-    
-    # Create the output parser
-    output_parser = PydanticOutputParser(pydantic_object=ArticleOutput)
+    few_shot_prompt = create_prompt_template(article_date, filename, author, failed_check)
     
     # Create the chain
-    chain = few_shot_prompt | llm | output_parser
+    chain = few_shot_prompt | llm | StrOutputParser()
     
     # Run the chain
-    result = chain.invoke({"input": article_text})
+    return invoke_with_token(chain, {"input": article_text}, cancel_token)
+
+def parse_article_output(raw_output: str, article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None) -> ArticleOutput:
+    """CPU-bound half of processing: parse the raw response into an ArticleOutput and clean its metadata."""
+    output_parser = PydanticOutputParser(pydantic_object=ArticleOutput)
+    result = output_parser.parse(raw_output)
+    return clean_metadata(result, article_date, filename, author)
+
+def process_article(article_text: str, article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None, llm: Optional[Any] = None, cancel_token: Optional[CancelToken] = None, fidelity_retries: int = 1) -> ArticleOutput:
+    """
+    Process an article using few-shot learning approach.
+    When the local fidelity check finds a truncated conversion, the article is retried up to
+    fidelity_retries times with the dropped paragraphs pointed out, keeping the best result.
+    """
+    best_result, best_report = None, None
+    failed_check = None
+    for _ in range(fidelity_retries + 1):
+        raw_output = invoke_article_model(article_text, article_date, filename, author, llm, cancel_token, failed_check)
+        result = parse_article_output(raw_output, article_date, filename, author)
+        
+        report = check_fidelity(article_text, result.markdown)
+        if best_report is None or attempt_rank(report) > attempt_rank(best_report):
+            best_result, best_report = result, report
+        if report.passed:
+            break
+        failed_check = report
     
-    # Post-process the result to ensure metadata correctness
+    return best_result
+
+def clean_metadata(result: ArticleOutput, article_date: Optional[str] = None, filename: Optional[str] = None, author: Optional[str] = None) -> ArticleOutput:
+    """Post-process the result to ensure metadata correctness."""
     if hasattr(result, 'json_metadata'):
         # Remove any empty values
         result.json_metadata = {k: v for k, v in result.json_metadata.items() if v and v.strip()}
@@ -190,11 +268,72 @@ def process_article(article_text: str, article_date: Optional[str] = None, filen
             
     return result
 
-def save_files(output: ArticleOutput, base_filename: str) -> tuple[Path, Path]:
-    """Save the processed output to files."""
+def create_metadata_prompt() -> PromptTemplate:
+    """Create the minimal prompt used to regenerate metadata for already-converted articles."""
+    template = """You write metadata for articles that are already converted to markdown.
+
+Your response must be a valid JSON object with a single "items" list containing one object per article with:
+1. "id": the article id exactly as given
+2. "title": the title in Arabic
+3. "description": a brief description in Arabic
+
+DO NOT guess or make up any values, base them only on the article content.
+
+{articles}"""
+    return PromptTemplate(input_variables=["articles"], template=template)
+
+def process_metadata(markdowns: Dict[str, str], llm: Optional[Any] = None, cancel_token: Optional[CancelToken] = None) -> Dict[str, ArticleMetadata]:
+    """
+    Regenerate only the title and description for one or more markdown articles in a single request.
+    Takes a mapping of article id to markdown and returns a mapping of article id to metadata.
+    """
+    if llm is None:
+        llm = ChatGoogleGenerativeAI(model=MODEL_NAME)
+    
+    articles = "\n\n---\n\n".join(
+        f"Article id: {article_id}\n{markdown}" for article_id, markdown in markdowns.items()
+    )
+    
+    chain = create_metadata_prompt() | llm | PydanticOutputParser(pydantic_object=MetadataBatch)
+    result = invoke_with_token(chain, {"articles": articles}, cancel_token)
+    
+    return {item.id: item for item in result.items if item.id in markdowns}
+
+def load_index(output_dir: Path = Path("output")) -> Dict[str, Dict[str, Any]]:
+    """Load the output index mapping each base filename to the prompt version it was produced with."""
+    index_path = Path(output_dir) / INDEX_FILENAME
+    if not index_path.exists():
+        return {}
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def update_index(entries: Dict[str, Dict[str, Any]], output_dir: Path = Path("output")):
+    """Record outputs in the index, replacing any previous entries for the same base filenames."""
+    with _index_lock:
+        index = load_index(output_dir)
+        index.update(entries)
+        index_path = Path(output_dir) / INDEX_FILENAME
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, index_path)
+
+def save_files(output: ArticleOutput, base_filename: str, source_text: Optional[str] = None, version: Optional[str] = None, image_path: Optional[str] = None, write_index: bool = True) -> tuple[Path, Path]:
+    """
+    Save the processed output to files.
+    The original article is kept as a .txt next to the outputs (same layout as data/) so it can be
+    reprocessed, and the output is stamped with the prompt version in the output index.
+    An image, if given, is copied as <base_filename><ext> and referenced in the metadata.
+    Pass write_index=False when saving from several processes and record the entry with update_index.
+    """
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
     
+    if image_path:
+        new_image_name = f"{base_filename}{Path(image_path).suffix}"
+        shutil.copy2(image_path, output_dir / new_image_name)
+        output.json_metadata['image'] = new_image_name
+    
     markdown_path = output_dir / f"{base_filename}.md"
     with open(markdown_path, "w", encoding="utf-8") as f:
         f.write(output.markdown)
@@ -203,4 +342,18 @@ def save_files(output: ArticleOutput, base_filename: str) -> tuple[Path, Path]:
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(output.json_metadata, f, ensure_ascii=False, indent=2)
     
-    return markdown_path, json_path
\ No newline at end of file
+    if source_text is not None:
+        with open(output_dir / f"{base_filename}.txt", "w", encoding="utf-8") as f:
+            f.write(source_text)
+    
+    if write_index:
+        update_index({base_filename: index_entry(version)}, output_dir)
+    
+    return markdown_path, json_path
+
+def index_entry(version: Optional[str] = None) -> Dict[str, Any]:
+    """Index entry stamping an output with the prompt version and model."""
+    return {
+        "version": version or prompt_version(),
+        "model": MODEL_NAME
+    }
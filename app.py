@@ -1,17 +1,23 @@
 import sys
 import os
-import shutil
-from pathlib import Path
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QTextEdit, QLineEdit, 
+                            QPlainTextEdit, QTextBrowser, QTabWidget,
                             QPushButton, QFileDialog, QMessageBox, QDateEdit,
                             QProgressBar, QSplitter, QFrame, QCheckBox,
                             QGraphicsDropShadowEffect, QSpacerItem, QSizePolicy)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate, QPropertyAnimation, QEasingCurve, QSize
-from PyQt5.QtGui import QFont, QIcon, QTextCursor, QPalette, QColor, QPixmap, QFontDatabase
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate, QPropertyAnimation, QEasingCurve, QSize, QTimer
+from PyQt5.QtGui import QFont, QIcon, QTextCursor, QPalette, QColor, QPixmap, QFontDatabase, QTextDocument
 
-from agent_processor import process_article, save_files, ArticleOutput
+from agent_processor import process_article, save_files, ArticleOutput, CancelToken, JobCancelled
+
+# Deadline in seconds for a single processing job
+JOB_TIMEOUT = 180
+# Delay before re-rendering the preview while the markdown keeps changing
+PREVIEW_DEBOUNCE_MS = 150
+# Above this size the rendered preview is skipped and only the plain-text view is used
+LARGE_PREVIEW_CHARS = 100_000
 
 class AnimatedButton(QPushButton):
     def __init__(self, text, parent=None, icon=None):
@@ -70,18 +76,21 @@ class ProcessThread(QThread):
     finished = pyqtSignal(object)
     error = pyqtSignal(str)
     progress = pyqtSignal(int)
+    cancelled = pyqtSignal(str)
     
-    def __init__(self, article_text, article_date, filename, author):
+    def __init__(self, article_text, article_date, filename, author, timeout=JOB_TIMEOUT):
         super().__init__()
         self.article_text = article_text
         self.article_date = article_date
         self.filename = filename
         self.author = author
+        self.cancel_token = CancelToken(timeout)
         
     def run(self):
         try:
             # Simulate progress for better UX
             for i in range(0, 101, 10):
+                self.cancel_token.check()
                 self.progress.emit(i)
                 self.msleep(100)
                 
@@ -89,19 +98,42 @@ class ProcessThread(QThread):
                 article_text=self.article_text,
                 article_date=self.article_date,
                 filename=self.filename,
-                author=self.author
+                author=self.author,
+                cancel_token=self.cancel_token
             )
             self.progress.emit(100)
             self.finished.emit(result)
+        except JobCancelled as e:
+            self.cancelled.emit(str(e))
         except Exception as e:
             self.error.emit(str(e))
 
+class PreviewRenderThread(QThread):
+    rendered = pyqtSignal(int, object)
+    
+    def __init__(self, generation, markdown_text):
+        super().__init__()
+        self.generation = generation
+        self.markdown_text = markdown_text
+        
+    def run(self):
+        # QTextDocument is not a widget, so the markdown parsing can happen off the GUI thread
+        document = QTextDocument()
+        document.setMarkdown(self.markdown_text)
+        # Hand the built document itself to the GUI thread instead of re-parsing it from HTML there
+        document.moveToThread(QApplication.instance().thread())
+        self.rendered.emit(self.generation, document)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Article Processor")
         self.setMinimumSize(1100, 800)
         self.selected_image_path = None
+        # Cancelled threads are kept alive until their aborted request unwinds
+        self.cancelled_threads = []
+        self.preview_generation = 0
+        self.preview_thread = None
         
         # Load custom fonts
         self.load_fonts()
@@ -123,7 +155,7 @@ class MainWindow(QMainWindow):
                 color: #2F2D2C;
                 font-size: 14px;
             }
-            QLineEdit, QTextEdit {
+            QLineEdit, QTextEdit, QPlainTextEdit {
                 padding: 8px;
                 border: 1px solid #DACDD3;
                 border-radius: 8px;
@@ -132,7 +164,7 @@ class MainWindow(QMainWindow):
                 selection-background-color: #B67251;
                 selection-color: #EEEAE4;
             }
-            QLineEdit:focus, QTextEdit:focus {
+            QLineEdit:focus, QTextEdit:focus, QPlainTextEdit:focus {
                 border: 1.5px solid #B67251;
             }
             QLineEdit::placeholder, QTextEdit::placeholder {
@@ -386,6 +418,12 @@ class MainWindow(QMainWindow):
         self.save_button.setEnabled(False)
         self.save_button.setMinimumHeight(35)
         
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setCursor(Qt.PointingHandCursor)
+        self.cancel_button.setIcon(QIcon.fromTheme("process-stop"))
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setMinimumHeight(35)
+        
         self.clear_button = QPushButton("Clear All")
         self.clear_button.setCursor(Qt.PointingHandCursor)
         self.clear_button.setIcon(QIcon.fromTheme("edit-clear"))
@@ -396,6 +434,7 @@ class MainWindow(QMainWindow):
         """)
         
         button_layout.addWidget(self.process_button)
+        button_layout.addWidget(self.cancel_button)
         button_layout.addWidget(self.save_button)
         button_layout.addWidget(self.clear_button)
         
@@ -440,7 +479,8 @@ class MainWindow(QMainWindow):
         markdown_layout.setContentsMargins(15, 15, 15, 15)
         markdown_label = QLabel("Markdown Output:")
         markdown_label.setFont(QFont("Arial", 10, QFont.Bold))
-        self.markdown_output = QTextEdit()
+        # Plain-text view lays out large documents far faster than a rich QTextEdit
+        self.markdown_output = QPlainTextEdit()
         self.markdown_output.setReadOnly(True)
         self.markdown_output.setFont(QFont("Consolas", 11))
         self.markdown_output.setStyleSheet("""
@@ -448,8 +488,24 @@ class MainWindow(QMainWindow):
             border: 1px solid #DACDD3;
             border-radius: 8px;
         """)
+        self.markdown_preview = QTextBrowser()
+        self.markdown_preview.setOpenExternalLinks(True)
+        self.markdown_preview.setStyleSheet("""
+            background-color: #F4F1ED;
+            border: 1px solid #DACDD3;
+            border-radius: 8px;
+        """)
+        self.markdown_tabs = QTabWidget()
+        self.markdown_tabs.addTab(self.markdown_output, "Markdown")
+        self.markdown_tabs.addTab(self.markdown_preview, "Preview")
         markdown_layout.addWidget(markdown_label)
-        markdown_layout.addWidget(self.markdown_output)
+        markdown_layout.addWidget(self.markdown_tabs)
+        
+        # Debounce preview rendering so repeated updates only render the latest text
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(PREVIEW_DEBOUNCE_MS)
+        self.preview_timer.timeout.connect(self.render_preview)
         
         # JSON output
         json_frame = StyledQFrame()
@@ -480,6 +536,7 @@ class MainWindow(QMainWindow):
         
         # Connect signals
         self.process_button.clicked.connect(self.process_article)
+        self.cancel_button.clicked.connect(self.cancel_processing)
         self.save_button.clicked.connect(self.save_results)
         self.clear_button.clicked.connect(self.clear_all)
         select_image_button.clicked.connect(self.select_image)
@@ -527,23 +584,49 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(True)
         self.progress_label.setVisible(True)
         self.process_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
         self.statusBar().showMessage("Processing article...")
         
         # Process in thread
+        self.cancelled_threads = [t for t in self.cancelled_threads if t.isRunning()]
         self.thread = ProcessThread(article_text, date_str, filename, author)
         self.thread.finished.connect(self.display_results)
         self.thread.error.connect(self.show_error)
+        self.thread.cancelled.connect(self.show_cancelled)
         self.thread.progress.connect(self.update_progress)
         self.thread.start()
     
+    def cancel_processing(self):
+        thread = self.thread
+        thread.cancel_token.cancel()
+        # Detach the thread so a late result can't reach the UI, and free the button right away
+        thread.finished.disconnect()
+        thread.error.disconnect()
+        thread.cancelled.disconnect()
+        thread.progress.disconnect()
+        self.cancelled_threads.append(thread)
+        self.show_cancelled("Job was cancelled")
+    
+    def show_cancelled(self, message):
+        self.progress_bar.setVisible(False)
+        self.progress_label.setVisible(False)
+        self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        if self.thread.cancel_token.expired:
+            self.statusBar().showMessage(f"Processing timed out after {JOB_TIMEOUT} seconds", 5000)
+        else:
+            self.statusBar().showMessage("Processing cancelled", 5000)
+    
     def update_progress(self, value):
         self.progress_bar.setValue(value)
     
     def display_results(self, result):
         self.result = result
+        # Keep the article this result was produced from, later jobs replace self.thread
+        self.result_source = self.sender().article_text
         
-        # Show markdown result with syntax highlighting
-        self.markdown_output.setText(result.markdown)
+        # Show markdown result and schedule the rendered preview
+        self.show_markdown(result.markdown)
         
         # Show JSON result with formatting
         import json
@@ -563,11 +646,57 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         self.progress_label.setVisible(False)
         self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
         self.statusBar().showMessage("Processing completed successfully!", 5000)
         
         # Flash the output background briefly to indicate success
         self.flash_success()
     
+    def show_markdown(self, text):
+        """Update the markdown view, appending only the new part when the text grows (e.g. while streaming)."""
+        current = self.markdown_output.toPlainText()
+        if current and text.startswith(current):
+            cursor = self.markdown_output.textCursor()
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text[len(current):])
+        else:
+            self.markdown_output.setPlainText(text)
+        self.schedule_preview()
+    
+    def schedule_preview(self):
+        large = len(self.markdown_output.toPlainText()) > LARGE_PREVIEW_CHARS
+        preview_index = self.markdown_tabs.indexOf(self.markdown_preview)
+        self.markdown_tabs.setTabEnabled(preview_index, not large)
+        if large:
+            # Rendering this much rich text would stall the window, stick to the plain-text view
+            self.preview_timer.stop()
+            self.preview_generation += 1
+            self.markdown_preview.clear()
+            self.markdown_tabs.setCurrentWidget(self.markdown_output)
+            return
+        self.preview_timer.start()
+    
+    def render_preview(self):
+        if self.preview_thread is not None and self.preview_thread.isRunning():
+            # Re-check once the running render is done so the latest text always gets rendered
+            self.preview_timer.start()
+            return
+        self.preview_generation += 1
+        self.preview_thread = PreviewRenderThread(self.preview_generation, self.markdown_output.toPlainText())
+        self.preview_thread.rendered.connect(self.display_preview)
+        self.preview_thread.start()
+    
+    def display_preview(self, generation, document):
+        # Drop renders that were superseded while they were running
+        if generation != self.preview_generation:
+            document.deleteLater()
+            return
+        previous = self.markdown_preview.document()
+        document.setParent(self.markdown_preview)
+        self.markdown_preview.setDocument(document)
+        if previous.parent() is self.markdown_preview:
+            previous.deleteLater()
+    
     def flash_success(self):
         # Flash the output frames to indicate success
         original_style = self.markdown_output.styleSheet()
@@ -579,10 +708,8 @@ class MainWindow(QMainWindow):
         
         self.markdown_output.setStyleSheet(success_style)
         self.json_output.setStyleSheet(success_style)
-        QApplication.processEvents()
         
         # Use a timer to reset the style
-        from PyQt5.QtCore import QTimer
         QTimer.singleShot(300, lambda: self.markdown_output.setStyleSheet(original_style))
         QTimer.singleShot(300, lambda: self.json_output.setStyleSheet(original_style))
     
@@ -591,6 +718,7 @@ class MainWindow(QMainWindow):
         self.progress_bar.setVisible(False)
         self.progress_label.setVisible(False)
         self.process_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
         self.statusBar().showMessage("Error during processing", 5000)
     
     def show_message_box(self, title, text, icon):
@@ -631,31 +759,20 @@ class MainWindow(QMainWindow):
             return
             
         try:
-            # Create output directory
-            output_dir = Path("output")
-            output_dir.mkdir(exist_ok=True)
-            
-            # Handle image if selected
-            if self.selected_image_path:
-                # Get the file extension from the original image
-                ext = Path(self.selected_image_path).suffix
-                # Create the new image path using the provided filename
-                new_image_name = f"{filename}{ext}"
-                new_image_path = output_dir / new_image_name
-                # Copy the image
-                shutil.copy2(self.selected_image_path, new_image_path)
-                # Update the image path in the metadata to match the new filename
-                self.result.json_metadata['image'] = new_image_name
-            
-            # Save files
-            md_path, json_path = save_files(self.result, filename)
+            # Save files, copying the image under the provided filename if selected
+            md_path, json_path = save_files(
+                self.result,
+                filename,
+                source_text=self.result_source,
+                image_path=self.selected_image_path
+            )
             
             success_message = f"Files saved successfully:\n\nMarkdown: {md_path}\nJSON: {json_path}"
             if self.selected_image_path:
-                success_message += f"\nImage: {new_image_name}"
+                success_message += f"\nImage: {self.result.json_metadata['image']}"
             
             self.show_message_box("Files Saved", success_message, QMessageBox.Information)
-            self.statusBar().showMessage(f"Files saved to {output_dir}", 5000)
+            self.statusBar().showMessage(f"Files saved to {md_path.parent}", 5000)
             
         except Exception as e:
             self.show_message_box("Error", f"Failed to save files: {str(e)}", QMessageBox.Critical)
@@ -663,6 +780,9 @@ class MainWindow(QMainWindow):
     def clear_all(self):
         self.article_text.clear()
         self.markdown_output.clear()
+        self.preview_timer.stop()
+        self.preview_generation += 1
+        self.markdown_preview.clear()
         self.json_output.clear()
         self.filename_input.clear()
         self.author_input.clear()
@@ -676,6 +796,7 @@ class MainWindow(QMainWindow):
         self.progress_label.setVisible(False)
         if hasattr(self, 'result'):
             del self.result
+            del self.result_source
         self.statusBar().showMessage("All fields cleared", 3000)
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+# batch_jobs.py
+
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+from langchain_core.output_parsers import PydanticOutputParser
+
+from agent_processor import ArticleOutput, create_prompt_template, clean_metadata, save_files, prompt_version
+from content_store import ContentStore
+
+def article_id(article: Dict[str, Any]) -> str:
+    """
+    Build a stable request ID for an article.
+    The same text and metadata always map to the same ID, so re-exporting is idempotent.
+    """
+    key = json.dumps(
+        [article.get("text"), article.get("date"), article.get("filename"), article.get("author")],
+        ensure_ascii=False
+    )
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    filename = article.get("filename")
+    return f"{filename}-{digest}" if filename else digest
+
+def manifest_path(requests_path: Path) -> Path:
+    """Path of the manifest that keeps per-request metadata next to the requests file."""
+    return requests_path.with_name(f"{requests_path.stem}.manifest.jsonl")
+
+def export_batch_requests(articles: List[Dict[str, Any]], requests_path: Path) -> Path:
+    """
+    Render the full few-shot prompt for each article into a batch-request JSONL file.
+    Each article is a dict with "text" and optional "date", "filename" and "author" keys.
+    Returns the path of the manifest written alongside the requests file.
+    """
+    requests_path = Path(requests_path)
+    manifest = manifest_path(requests_path)
+    version = prompt_version()
+
+    with open(requests_path, "w", encoding="utf-8") as requests_file, \
+         open(manifest, "w", encoding="utf-8") as manifest_file:
+        for article in articles:
+            key = article_id(article)
+            few_shot_prompt = create_prompt_template(article.get("date"), article.get("filename"), article.get("author"))
+            prompt = few_shot_prompt.format(input=article["text"])
+
+            request = {
+                "key": key,
+                "request": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+            }
+            requests_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+            # The batch API only echoes the key back, so keep the metadata locally
+            entry = {
+                "key": key,
+                "text": article["text"],
+                "date": article.get("date"),
+                "filename": article.get("filename"),
+                "author": article.get("author"),
+                "version": version
+            }
+            manifest_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    return manifest
+
+def _read_jsonl(path: Path) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _response_text(line: Dict[str, Any]) -> str:
+    """Extract the model text from a batch result line."""
+    if "error" in line:
+        raise ValueError(f"Request failed: {line['error']}")
+    candidates = line.get("response", {}).get("candidates") or []
+    if not candidates:
+        raise ValueError("Response has no candidates")
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+def ingest_batch_results(results_path: Path, requests_path: Path, store: Optional[ContentStore] = None) -> Dict[str, Any]:
+    """
+    Parse each response in a batch-results JSONL file into an ArticleOutput,
+    apply the metadata post-processing and save the files (to the store if one is given).
+    Returns a dict with the saved paths per key and the errors per key.
+    """
+    save = store.save_files if store is not None else save_files
+    manifest = {entry["key"]: entry for entry in _read_jsonl(manifest_path(Path(requests_path)))}
+    output_parser = PydanticOutputParser(pydantic_object=ArticleOutput)
+
+    saved = {}
+    errors = {}
+    for line in _read_jsonl(Path(results_path)):
+        key = line.get("key")
+        entry = manifest.get(key)
+        if entry is None:
+            errors[key] = "Unknown key, not present in the manifest"
+            continue
+        try:
+            result = output_parser.parse(_response_text(line))
+            result = clean_metadata(result, entry["date"], entry["filename"], entry["author"])
+            saved[key] = save(result, entry["filename"] or key, source_text=entry["text"], version=entry["version"])
+        except Exception as e:
+            errors[key] = str(e)
+
+    return {"saved": saved, "errors": errors}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export articles to a batch-request file and ingest the results offline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Render prompts into a batch-request JSONL file")
+    export_parser.add_argument("articles", type=Path, help="JSONL file with text, filename, author and date per line")
+    export_parser.add_argument("requests", type=Path, help="Batch-request JSONL file to write")
+
+    ingest_parser = subparsers.add_parser("ingest", help="Parse a batch-results JSONL file and save the outputs")
+    ingest_parser.add_argument("results", type=Path, help="Batch-results JSONL file")
+    ingest_parser.add_argument("requests", type=Path, help="Batch-request JSONL file the results belong to")
+    ingest_parser.add_argument("--store", type=Path, default=None, help="Save into this content store instead of output/")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        articles = _read_jsonl(args.articles)
+        manifest = export_batch_requests(articles, args.requests)
+        print(f"Exported {len(articles)} requests to {args.requests} (manifest: {manifest})")
+        return 0
+
+    store = ContentStore(args.store) if args.store else None
+    try:
+        report = ingest_batch_results(args.results, args.requests, store)
+    finally:
+        if store is not None:
+            store.close()
+    for key, (md_path, json_path) in report["saved"].items():
+        print(f"{key}: {md_path}, {json_path}")
+    for key, error in report["errors"].items():
+        print(f"{key}: ERROR {error}", file=sys.stderr)
+    return 1 if report["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# cancellation.py
+
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, Any
+
+class JobCancelled(Exception):
+    """Raised when a processing job is cancelled before it finishes."""
+
+class JobExpired(JobCancelled, TimeoutError):
+    """Raised when a processing job runs past its deadline."""
+
+class CancelToken:
+    """
+    Cooperative cancellation token with an optional deadline.
+    A token created with a parent is also stopped when the parent is.
+    """
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancelToken"] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.parent = parent
+        self._event = threading.Event()
+    
+    def cancel(self):
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+    
+    @property
+    def expired(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.parent is not None and self.parent.expired
+    
+    @property
+    def stopped(self) -> bool:
+        return self.cancelled or self.expired
+    
+    def check(self):
+        """Raise JobCancelled or JobExpired if the job should stop."""
+        if self.cancelled:
+            raise JobCancelled("Job was cancelled")
+        if self.expired:
+            raise JobExpired("Job exceeded its deadline")
+
+# How often an in-flight call checks its token, in seconds
+POLL_INTERVAL = 0.05
+
+def invoke_with_token(chain: Any, inputs: Dict[str, Any], cancel_token: Optional[CancelToken] = None) -> Any:
+    """
+    Invoke a chain, aborting the underlying request as soon as the token is cancelled or expires.
+    The chain runs on its own event loop so an async request is cancelled rather than abandoned.
+    A sync runnable (run by ainvoke on the loop's executor thread) can't be interrupted, so its
+    call is abandoned instead; either way this returns within POLL_INTERVAL of the token stopping.
+    """
+    if cancel_token is None:
+        return chain.invoke(inputs)
+    
+    async def run():
+        cancel_token.check()
+        task = asyncio.ensure_future(chain.ainvoke(inputs))
+        while not task.done():
+            if cancel_token.stopped:
+                task.cancel()
+                cancel_token.check()
+            await asyncio.wait({task}, timeout=POLL_INTERVAL)
+        return task.result()
+    
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run())
+    finally:
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        # Unlike asyncio.run, don't wait for the default executor: close() shuts it down
+        # without joining, so a sync call still running there no longer holds the caller
+        loop.close()
@@ -0,0 +1,189 @@
+# concurrency.py
+
+import math
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Callable
+
+from cancellation import CancelToken, JobCancelled, JobExpired
+
+# Provider exception types that mean overload, matched by name so the client library stays optional
+OVERLOAD_ERRORS = ("ResourceExhausted", "TooManyRequests", "DeadlineExceeded", "ServiceUnavailable")
+OVERLOAD_STATUS_CODES = (429, 503, 504)
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Return True for errors that mean the provider is overloaded (429s, quota errors and timeouts).
+    Errors are classified by type and status code, never by free text that may quote the model output;
+    wrapped errors are followed through their __cause__.
+    """
+    while error is not None:
+        if isinstance(error, TimeoutError):
+            return True
+        if any(cls.__name__ in OVERLOAD_ERRORS for cls in type(error).__mro__):
+            return True
+        for attribute in ("code", "status_code"):
+            code = getattr(error, attribute, None)
+            if isinstance(code, int) and code in OVERLOAD_STATUS_CODES:
+                return True
+        # Clients that only format the status into the message put it first, e.g. "429 Resource exhausted"
+        if str(error).lstrip().startswith("429"):
+            return True
+        error = error.__cause__
+    return False
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limiter for model calls.
+    The limit grows by `increase` after every healthy window of completed calls and is
+    multiplied by `decrease` as soon as a 429 or timeout is seen, or when a window
+    has a p95 latency above `latency_target` or an error rate above `error_threshold`.
+    The clock is injectable so the controller can be driven deterministically.
+    """
+    def __init__(self, initial: int = 2, minimum: int = 1, maximum: int = 16,
+                 increase: int = 1, decrease: float = 0.5, window: int = 10,
+                 latency_target: float = 30.0, error_threshold: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.clock = clock
+
+        self.limit = max(minimum, min(maximum, initial))
+        self.in_flight = 0
+        # Bumped on every decrease, so errors from calls sent at an older limit only cut it once
+        self.generation = 0
+        self.history = [(clock(), self.limit, "initial")]
+        self._latencies = deque(maxlen=window)
+        self._failures = deque(maxlen=window)
+        self._condition = threading.Condition()
+
+    def acquire(self, cancel_token: Optional[CancelToken] = None) -> bool:
+        """Block until a slot is free under the current limit. Returns False if the token stops first."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                if cancel_token is not None and cancel_token.stopped:
+                    return False
+                self._condition.wait(0.1 if cancel_token is not None else None)
+            self.in_flight += 1
+            return True
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free under the current limit, without blocking."""
+        with self._condition:
+            if self.in_flight >= self.limit:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: float, error: Optional[BaseException] = None, record: bool = True,
+                generation: Optional[int] = None):
+        """
+        Free a slot and, unless record is False, feed the call outcome into the controller.
+        generation is the controller generation read when the call started.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            if record:
+                self.record(latency, error, generation)
+            self._condition.notify_all()
+
+    def record(self, latency: float, error: Optional[BaseException] = None, generation: Optional[int] = None):
+        """Update the limit from a single call outcome."""
+        if error is not None and is_overload_error(error):
+            # Calls started before the last cut belong to the same congestion event
+            if generation is None or generation == self.generation:
+                self._set_limit(int(self.limit * self.decrease), "overload")
+            return
+
+        self._latencies.append(latency)
+        self._failures.append(error is not None)
+        if len(self._latencies) < self.window:
+            return
+
+        if self.p95_latency() > self.latency_target:
+            self._set_limit(int(self.limit * self.decrease), "latency")
+        elif self.error_rate() > self.error_threshold:
+            self._set_limit(int(self.limit * self.decrease), "errors")
+        else:
+            self._set_limit(self.limit + self.increase, "healthy")
+
+    def _set_limit(self, limit: int, reason: str):
+        if limit < self.limit:
+            self.generation += 1
+        self.limit = max(self.minimum, min(self.maximum, limit))
+        self.history.append((self.clock(), self.limit, reason))
+        # Start a fresh observation window after every adjustment
+        self._latencies.clear()
+        self._failures.clear()
+
+    def p95_latency(self) -> float:
+        return percentile(list(self._latencies), 0.95)
+
+    def error_rate(self) -> float:
+        return sum(self._failures) / len(self._failures) if self._failures else 0.0
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of the current limit, window health and limit history."""
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "p95_latency": self.p95_latency(),
+                "error_rate": self.error_rate(),
+                "history": list(self.history)
+            }
+
+def run_adaptive(jobs: List[Dict[str, Any]], controller: Optional[AdaptiveConcurrency] = None,
+                 worker: Optional[Callable[..., Any]] = None, cancel_token: Optional[CancelToken] = None,
+                 job_timeout: Optional[float] = None) -> List[Any]:
+    """
+    Run `worker(**job)` for every job under an adaptive concurrency limit.
+    Returns the results in job order; failed jobs hold their exception instead of a result.
+    With a cancel_token or job_timeout, each job gets its own token (deadline counted from when it
+    gets a slot) passed as `cancel_token`, and stopped jobs hold JobCancelled/JobExpired.
+    """
+    if worker is None:
+        # Imported here so the controller can be used and tested without the model client
+        from agent_processor import process_article
+        worker = process_article
+    if controller is None:
+        controller = AdaptiveConcurrency()
+
+    def run_job(job: Dict[str, Any]) -> Any:
+        if not controller.acquire(cancel_token):
+            try:
+                cancel_token.check()
+            except JobCancelled as e:
+                return e
+        start = controller.clock()
+        generation = controller.generation
+        try:
+            if cancel_token is not None or job_timeout:
+                result = worker(**job, cancel_token=CancelToken(job_timeout, parent=cancel_token))
+            else:
+                result = worker(**job)
+        except Exception as e:
+            # A user cancellation says nothing about provider health, a missed deadline does
+            user_cancelled = isinstance(e, JobCancelled) and not isinstance(e, JobExpired)
+            controller.release(controller.clock() - start, e, record=not user_cancelled, generation=generation)
+            return e
+        controller.release(controller.clock() - start, generation=generation)
+        return result
+
+    with ThreadPoolExecutor(max_workers=controller.maximum) as executor:
+        return list(executor.map(run_job, jobs))
@@ -0,0 +1,201 @@
+# content_store.py
+
+import sys
+import json
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+from agent_processor import ArticleOutput, INDEX_FILENAME, index_entry, load_index
+
+# Let SQLite serve reads straight from a memory-mapped view of the file
+MMAP_SIZE = 1 << 30
+
+class ContentStore:
+    """
+    Single-file SQLite store for processed articles, an alternative to loose files in output/.
+    Markdown, metadata, the source article and image bytes of an article live in one row keyed
+    by base filename, so every save is one transaction and lookups go through the primary key.
+    save_files mirrors agent_processor.save_files so either backend can be passed around.
+    """
+    def __init__(self, path: Path = Path("output.db")):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                base_filename TEXT PRIMARY KEY,
+                markdown TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                source_text TEXT,
+                image_name TEXT,
+                image BLOB,
+                version TEXT,
+                model TEXT
+            )
+        """)
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "ContentStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, base_filename: str) -> bool:
+        return self._fetch_one("SELECT 1 FROM articles WHERE base_filename = ?", base_filename) is not None
+
+    def _fetch_one(self, query: str, *params: Any) -> Optional[tuple]:
+        with self._lock:
+            return self._connection.execute(query, params).fetchone()
+
+    def save_files(self, output: ArticleOutput, base_filename: str, source_text: Optional[str] = None, version: Optional[str] = None, image_path: Optional[str] = None) -> tuple[str, str]:
+        """
+        Save the processed output in a single transaction.
+        An image, if given, is stored as <base_filename><ext>; otherwise a previously stored image is kept.
+        Returns the locations of the markdown and metadata inside the store.
+        """
+        image_name, image = None, None
+        if image_path:
+            image_name = f"{base_filename}{Path(image_path).suffix}"
+            image = Path(image_path).read_bytes()
+            output.json_metadata['image'] = image_name
+
+        entry = index_entry(version)
+        with self._lock, self._connection:
+            self._connection.execute("""
+                INSERT INTO articles (base_filename, markdown, metadata, source_text, image_name, image, version, model)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(base_filename) DO UPDATE SET
+                    markdown = excluded.markdown,
+                    metadata = excluded.metadata,
+                    source_text = COALESCE(excluded.source_text, source_text),
+                    image_name = COALESCE(excluded.image_name, image_name),
+                    image = COALESCE(excluded.image, image),
+                    version = excluded.version,
+                    model = excluded.model
+            """, (
+                base_filename,
+                output.markdown,
+                json.dumps(output.json_metadata, ensure_ascii=False),
+                source_text,
+                image_name,
+                image,
+                entry["version"],
+                entry["model"]
+            ))
+
+        return f"{self.path}:{base_filename}.md", f"{self.path}:{base_filename}.json"
+
+    def load(self, base_filename: str) -> Optional[ArticleOutput]:
+        """Load the markdown and metadata of an article, None if it isn't stored."""
+        row = self._fetch_one("SELECT markdown, metadata FROM articles WHERE base_filename = ?", base_filename)
+        if row is None:
+            return None
+        return ArticleOutput(markdown=row[0], json_metadata=json.loads(row[1]))
+
+    def load_source(self, base_filename: str) -> Optional[str]:
+        row = self._fetch_one("SELECT source_text FROM articles WHERE base_filename = ?", base_filename)
+        return row[0] if row else None
+
+    def load_image(self, base_filename: str) -> Optional[tuple[str, bytes]]:
+        """Return the image name and bytes of an article, None if it has no image."""
+        row = self._fetch_one("SELECT image_name, image FROM articles WHERE base_filename = ?", base_filename)
+        if row is None or row[1] is None:
+            return None
+        return row[0], row[1]
+
+    def load_index(self) -> Dict[str, Dict[str, Any]]:
+        """Same shape as agent_processor.load_index, read from the store."""
+        with self._lock:
+            rows = self._connection.execute("SELECT base_filename, version, model FROM articles").fetchall()
+        return {base: {"version": version, "model": model} for base, version, model in rows}
+
+    def bases(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT base_filename FROM articles ORDER BY base_filename").fetchall()
+        return [row[0] for row in rows]
+
+    def export(self, output_dir: Path) -> int:
+        """Write every article out as loose .md/.json/.txt/image files plus the index, for publishing."""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT base_filename, markdown, metadata, source_text, image_name, image FROM articles"
+            ).fetchall()
+
+        for base, markdown, metadata, source_text, image_name, image in rows:
+            with open(output_dir / f"{base}.md", "w", encoding="utf-8") as f:
+                f.write(markdown)
+            with open(output_dir / f"{base}.json", "w", encoding="utf-8") as f:
+                json.dump(json.loads(metadata), f, ensure_ascii=False, indent=2)
+            if source_text is not None:
+                with open(output_dir / f"{base}.txt", "w", encoding="utf-8") as f:
+                    f.write(source_text)
+            if image is not None:
+                (output_dir / image_name).write_bytes(image)
+
+        with open(output_dir / INDEX_FILENAME, "w", encoding="utf-8") as f:
+            json.dump(self.load_index(), f, ensure_ascii=False, indent=2)
+
+        return len(rows)
+
+    def import_directory(self, output_dir: Path) -> int:
+        """Load loose output files (as written by agent_processor.save_files) into the store."""
+        output_dir = Path(output_dir)
+        index = load_index(output_dir)
+        count = 0
+        for markdown_path in sorted(output_dir.glob("*.md")):
+            base = markdown_path.stem
+            json_path = output_dir / f"{base}.json"
+            metadata = json.loads(json_path.read_text(encoding="utf-8")) if json_path.exists() else {}
+            source_path = output_dir / f"{base}.txt"
+            image_name = metadata.get("image")
+            # Older outputs reference the image without its extension
+            image_paths = [output_dir / image_name, *output_dir.glob(f"{image_name}.*")] if image_name else []
+            image_path = next((p for p in image_paths if p.is_file() and p.suffix not in (".md", ".json", ".txt")), None)
+
+            output = ArticleOutput(markdown=markdown_path.read_text(encoding="utf-8"), json_metadata=metadata)
+            self.save_files(
+                output,
+                base,
+                source_text=source_path.read_text(encoding="utf-8") if source_path.exists() else None,
+                version=index.get(base, {}).get("version", "unknown"),
+                image_path=str(image_path) if image_path else None
+            )
+            count += 1
+        return count
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the single-file content store.")
+    parser.add_argument("--store", type=Path, default=Path("output.db"), help="Path of the store file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="Load loose output files into the store")
+    import_parser.add_argument("output_dir", nargs="?", type=Path, default=Path("output"))
+
+    export_parser = subparsers.add_parser("export", help="Write the store out as loose files for publishing")
+    export_parser.add_argument("output_dir", type=Path)
+
+    args = parser.parse_args(argv)
+
+    with ContentStore(args.store) as store:
+        if args.command == "import":
+            count = store.import_directory(args.output_dir)
+            print(f"Imported {count} article(s) from {args.output_dir} into {args.store}")
+        else:
+            count = store.export(args.output_dir)
+            print(f"Exported {count} article(s) from {args.store} to {args.output_dir}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# fidelity.py
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+from typing import List, Optional, Dict
+from pydantic import BaseModel, Field
+
+# Thresholds below which a conversion is treated as truncated
+MIN_COVERAGE = 0.8
+MIN_TAIL_COVERAGE = 0.6
+MIN_LENGTH_RATIO = 0.8
+MAX_DROPPED_PARAGRAPHS = 1
+# A source paragraph counts as dropped when less than this share of its words survive
+PARAGRAPH_KEEP_RATIO = 0.5
+# Paragraphs shorter than this are ignored (separators, "// ..." notes, one-word lines)
+MIN_PARAGRAPH_TOKENS = 5
+# Share of the source, counted from the end, used for the tail coverage
+TAIL_FRACTION = 0.2
+
+_FENCE = re.compile(r"^\s*```.*$", re.MULTILINE)
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_LINE_MARKERS = re.compile(r"^\s{0,3}(#{1,6}\s+|>\s*|[-*+]\s+|\d+[.)]\s+)", re.MULTILINE)
+_EMPHASIS = re.compile(r"[*_`~]+")
+# Arabic diacritics and tatweel, which the model may add or drop freely
+_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_LETTER_VARIANTS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ى": "ي", "ة": "ه"})
+_TOKEN = re.compile(r"\w+")
+
+class FidelityReport(BaseModel):
+    coverage: float = Field(description="Share of source words present in the output")
+    tail_coverage: float = Field(description="Share of the last part of the source present in the output")
+    length_ratio: float = Field(description="Output word count divided by source word count")
+    dropped_paragraphs: List[str] = Field(default_factory=list, description="Source paragraphs missing from the output")
+    passed: bool = Field(description="False when the output looks truncated")
+
+def strip_markdown(text: str) -> str:
+    """Remove markdown syntax, keeping the visible text."""
+    text = _FENCE.sub("", text)
+    text = _IMAGE.sub(r"\1", text)
+    text = _LINK.sub(r"\1", text)
+    text = _LINE_MARKERS.sub("", text)
+    return _EMPHASIS.sub(" ", text)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with Arabic spelling variants normalised."""
+    text = _DIACRITICS.sub("", text.lower()).translate(_LETTER_VARIANTS)
+    return _TOKEN.findall(text)
+
+def _coverage(source: Counter, output: Counter) -> float:
+    total = sum(source.values())
+    if not total:
+        return 1.0
+    return sum(min(count, output[token]) for token, count in source.items()) / total
+
+def check_fidelity(source_text: str, markdown: str) -> FidelityReport:
+    """Compare a markdown conversion with its source article using token-level metrics."""
+    source_tokens = tokenize(source_text)
+    output_tokens = tokenize(strip_markdown(markdown))
+    output_counts = Counter(output_tokens)
+
+    coverage = _coverage(Counter(source_tokens), output_counts)
+    tail_start = int(len(source_tokens) * (1 - TAIL_FRACTION))
+    tail_coverage = _coverage(Counter(source_tokens[tail_start:]), output_counts)
+    length_ratio = len(output_tokens) / len(source_tokens) if source_tokens else 1.0
+
+    dropped = []
+    for paragraph in source_text.splitlines():
+        tokens = tokenize(paragraph)
+        if len(tokens) < MIN_PARAGRAPH_TOKENS:
+            continue
+        kept = sum(1 for token in tokens if token in output_counts)
+        if kept / len(tokens) < PARAGRAPH_KEEP_RATIO:
+            dropped.append(paragraph.strip())
+
+    passed = (
+        coverage >= MIN_COVERAGE
+        and tail_coverage >= MIN_TAIL_COVERAGE
+        and length_ratio >= MIN_LENGTH_RATIO
+        and len(dropped) <= MAX_DROPPED_PARAGRAPHS
+    )
+    return FidelityReport(
+        coverage=coverage,
+        tail_coverage=tail_coverage,
+        length_ratio=length_ratio,
+        dropped_paragraphs=dropped,
+        passed=passed
+    )
+
+def attempt_rank(report: FidelityReport) -> tuple:
+    """Sort key for attempts at the same article: any passing attempt beats a failing one, then coverage decides."""
+    return (report.passed, report.coverage)
+
+def describe_failures(report: FidelityReport) -> List[str]:
+    """Plain-language reasons a report failed, one per failed metric."""
+    reasons = []
+    if report.coverage < MIN_COVERAGE:
+        reasons.append(f"only {report.coverage:.0%} of the original words were kept")
+    if report.tail_coverage < MIN_TAIL_COVERAGE:
+        reasons.append("the end of the article was cut off")
+    if report.length_ratio < MIN_LENGTH_RATIO:
+        reasons.append(f"it was only {report.length_ratio:.0%} of the original length")
+    if len(report.dropped_paragraphs) > MAX_DROPPED_PARAGRAPHS:
+        reasons.append(f"{len(report.dropped_paragraphs)} paragraphs were left out")
+    return reasons
+
+def check_outputs(output_dir: Path = Path("output")) -> Dict[str, FidelityReport]:
+    """Check every output that has its source article kept as a .txt next to it."""
+    reports = {}
+    for source_path in sorted(Path(output_dir).glob("*.txt")):
+        markdown_path = source_path.with_suffix(".md")
+        if not markdown_path.exists():
+            continue
+        with open(source_path, "r", encoding="utf-8") as f:
+            source_text = f.read()
+        with open(markdown_path, "r", encoding="utf-8") as f:
+            markdown = f.read()
+        reports[source_path.stem] = check_fidelity(source_text, markdown)
+    return reports
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check saved markdown outputs against their source articles.")
+    parser.add_argument("output_dir", nargs="?", type=Path, default=Path("output"), help="Directory with .txt/.md pairs")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reports = check_outputs(args.output_dir)
+    elapsed = time.perf_counter() - start
+
+    for base, report in reports.items():
+        status = "ok" if report.passed else "TRUNCATED"
+        print(f"{base}: {status} coverage={report.coverage:.2f} tail={report.tail_coverage:.2f} "
+              f"length={report.length_ratio:.2f} dropped={len(report.dropped_paragraphs)}")
+    print(f"Checked {len(reports)} output(s) in {elapsed * 1000:.1f} ms")
+    return 0 if all(report.passed for report in reports.values()) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# loadgen.py
+
+import os
+import sys
+import json
+import math
+import time
+import queue
+import random
+import argparse
+import threading
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# The fake model never talks to the API, so don't prompt for a key
+os.environ.setdefault("GOOGLE_API_KEY", "load-test")
+
+from agent_processor import process_article
+from concurrency import percentile
+
+ARTICLE_MARKER = "Now, process the following article:\n"
+METADATA_MARKER = "\n\nAdditional metadata:"
+
+class FakeLLM:
+    """
+    Local stand-in for the Gemini model with configurable latency and error distributions.
+    Latency is log-normal around `latency_median` seconds, scaled by `time_scale` to run faster.
+    Responses echo the article back as markdown so parsing and the fidelity check do real work.
+    """
+    def __init__(self, latency_median: float = 8.0, latency_sigma: float = 0.5,
+                 error_rate: float = 0.02, timeout_rate: float = 0.01,
+                 time_scale: float = 1.0, seed: int = 0):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.time_scale = time_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: Any) -> str:
+        text = prompt.to_string() if hasattr(prompt, "to_string") else str(prompt)
+        with self._lock:
+            latency = self._random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+            roll = self._random.random()
+
+        if roll < self.timeout_rate:
+            time.sleep(latency * 3 * self.time_scale)
+            raise TimeoutError("Fake model request timed out")
+        time.sleep(latency * self.time_scale)
+        if roll < self.timeout_rate + self.error_rate:
+            raise RuntimeError("429 Resource exhausted (fake quota)")
+
+        start = text.rfind(ARTICLE_MARKER) + len(ARTICLE_MARKER)
+        article = text[start:text.find(METADATA_MARKER, start)]
+        return json.dumps({
+            "markdown": article,
+            "json_metadata": {"title": "عنوان تجريبي", "description": "وصف تجريبي"},
+            "user_queries": []
+        }, ensure_ascii=False)
+
+def synthetic_articles(count: int, seed: int = 0, sample_dirs: tuple = (Path("data"), Path("output"))) -> List[str]:
+    """
+    Build articles whose sizes and vocabulary are drawn from the sample .txt/.md files.
+    """
+    sizes, words = [], []
+    for directory in sample_dirs:
+        for path in list(directory.glob("*.txt")) + list(directory.glob("*.md")):
+            text = path.read_text(encoding="utf-8")
+            sizes.append(len(text))
+            words.extend(text.split())
+    if not words:
+        raise ValueError("No sample articles found to size the synthetic articles")
+
+    rng = random.Random(seed)
+    articles = []
+    for _ in range(count):
+        target = rng.choice(sizes)
+        lines, length = [], 0
+        while length < target:
+            line = " ".join(rng.choice(words) for _ in range(rng.randint(10, 25)))
+            lines.append(line)
+            length += len(line) + 1
+        articles.append("\n".join(lines))
+    return articles
+
+def memory_high_water_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, None where it can't be measured."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_load_test(requests: int = 200, rate: float = 5.0, concurrency: int = 50,
+                  llm: Optional[Any] = None, sample_interval: float = 0.5, seed: int = 0) -> Dict[str, Any]:
+    """
+    Submit `requests` articles with Poisson arrivals at `rate` per second to `concurrency`
+    workers calling process_article, and report throughput, latency percentiles,
+    queue depth over time and the memory high-water mark.
+    """
+    if llm is None:
+        llm = FakeLLM(seed=seed)
+    articles = synthetic_articles(requests, seed)
+    rng = random.Random(seed)
+
+    pending = queue.Queue()
+    latencies, service_times, errors = [], [], {}
+    in_flight = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def worker():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            index, arrived = item
+            with lock:
+                in_flight[0] += 1
+            started = time.monotonic()
+            try:
+                process_article(articles[index], filename=f"load-{index}", llm=llm)
+                error = None
+            except Exception as e:
+                error = type(e).__name__
+            finished = time.monotonic()
+            with lock:
+                in_flight[0] -= 1
+                if error is None:
+                    latencies.append(finished - arrived)
+                    service_times.append(finished - started)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    queue_depth = []
+    def sampler():
+        while not done.wait(sample_interval):
+            with lock:
+                queue_depth.append((round(time.monotonic() - start, 3), pending.qsize(), in_flight[0]))
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in workers:
+        thread.start()
+
+    start = time.monotonic()
+    sampler_thread = threading.Thread(target=sampler, daemon=True)
+    sampler_thread.start()
+
+    # Poisson arrivals: exponential gaps between submissions
+    next_arrival = start
+    for index in range(requests):
+        next_arrival += rng.expovariate(rate)
+        delay = next_arrival - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((index, time.monotonic()))
+
+    for _ in workers:
+        pending.put(None)
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - start
+    done.set()
+    sampler_thread.join()
+
+    return {
+        "requests": requests,
+        "completed": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": {name: percentile(latencies, fraction) for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "service_time": {name: percentile(service_times, fraction) for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "max_queue_depth": max((depth for _, depth, _ in queue_depth), default=0),
+        "queue_depth": queue_depth,
+        "memory_high_water_mb": memory_high_water_mb()
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test process_article against a local fake model.")
+    parser.add_argument("--requests", type=int, default=200, help="Number of articles to submit")
+    parser.add_argument("--rate", type=float, default=5.0, help="Mean arrivals per second")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent workers")
+    parser.add_argument("--latency-median", type=float, default=8.0, help="Median fake model latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal sigma of the fake model latency")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of calls failing with a 429")
+    parser.add_argument("--timeout-rate", type=float, default=0.01, help="Share of calls timing out")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiply fake latencies, e.g. 0.01 for a quick run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, default=None, help="Also write the full report to this file")
+    args = parser.parse_args(argv)
+
+    llm = FakeLLM(args.latency_median, args.latency_sigma, args.error_rate, args.timeout_rate, args.time_scale, args.seed)
+    report = run_load_test(args.requests, args.rate, args.concurrency, llm, seed=args.seed)
+
+    print(f"Completed {report['completed']}/{report['requests']} in {report['elapsed']:.1f}s "
+          f"({report['throughput']:.2f} articles/s)")
+    print("Latency (s): " + ", ".join(f"{k}={v:.2f}" for k, v in report["latency"].items()))
+    print("Service time (s): " + ", ".join(f"{k}={v:.2f}" for k, v in report["service_time"].items()))
+    print(f"Errors: {report['errors'] or 'none'}")
+    print(f"Max queue depth: {report['max_queue_depth']}")
+    if report["memory_high_water_mb"] is not None:
+        print(f"Memory high-water mark: {report['memory_high_water_mb']:.1f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
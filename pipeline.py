@@ -0,0 +1,137 @@
+# pipeline.py
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Dict, Any
+
+from agent_processor import (ArticleOutput, invoke_article_model, parse_article_output, save_files, update_index,
+                             index_entry, prompt_version, CancelToken)
+from concurrency import AdaptiveConcurrency, run_adaptive
+from content_store import ContentStore
+from fidelity import FidelityReport, attempt_rank, check_fidelity
+
+def _save(result: ArticleOutput, job: Dict[str, Any], report: FidelityReport, save: bool) -> Dict[str, Any]:
+    if job.get("image"):
+        # Keep an image reference from a previous save
+        result.json_metadata['image'] = job["image"]
+    if not save:
+        return {"saved": True, "fidelity": report, "result": result}
+    md_path, json_path = save_files(
+        result,
+        job["filename"],
+        source_text=job["article_text"],
+        image_path=job.get("image_path"),
+        write_index=False
+    )
+    return {"saved": True, "fidelity": report, "markdown": md_path, "json": json_path}
+
+def postprocess_article(raw_output: str, job: Dict[str, Any], save_if_passed: bool = True, save: bool = True) -> Dict[str, Any]:
+    """
+    CPU-bound stage, run in a worker process: parse the raw response, clean the metadata,
+    check fidelity and, if it passed and save_if_passed is set, save the files.
+    Only paths and the fidelity report are sent back.
+    With save=False the parsed result is sent back instead, for the caller to store.
+    """
+    result = parse_article_output(raw_output, job.get("article_date"), job["filename"], job.get("author"))
+    report = check_fidelity(job["article_text"], result.markdown)
+    if not (report.passed and save_if_passed):
+        return {"saved": False, "fidelity": report}
+    return _save(result, job, report, save)
+
+def save_article(raw_output: str, job: Dict[str, Any], report: FidelityReport, save: bool = True) -> Dict[str, Any]:
+    """Worker-process stage saving an attempt the caller picked, with its already computed report."""
+    result = parse_article_output(raw_output, job.get("article_date"), job["filename"], job.get("author"))
+    return _save(result, job, report, save)
+
+def run_pipeline(jobs: List[Dict[str, Any]], workers: int = 4, cpu_workers: Optional[int] = None,
+                 fidelity_retries: int = 1, llm: Optional[Any] = None,
+                 cancel_token: Optional[CancelToken] = None, job_timeout: Optional[float] = None,
+                 store: Optional[ContentStore] = None) -> List[Any]:
+    """
+    Process a batch of articles with model calls on an adaptive thread tier and the CPU-bound
+    post-processing on a process pool, so the Python-side work scales with cores.
+    A first attempt that passes the fidelity check is saved straight from the worker. Otherwise
+    the article is retried and, like process_article, the best attempt by attempt_rank is saved.
+    Each job is a dict with article_text, filename and optional article_date, author,
+    image_path (image to copy) or image (existing image name to keep).
+    With a store, results are written to it from this process instead of to output/.
+    Returns, in job order, the saved outcome or the exception of each job.
+    """
+    version = prompt_version()
+    jobs = list(jobs)
+    outcomes: List[Any] = [None] * len(jobs)
+    # Best retried attempt so far per job: its report and raw response, kept here rather than re-sent
+    best: Dict[int, tuple] = {}
+
+    def finish(i: int, outcome: Dict[str, Any]):
+        if store is not None and "result" in outcome:
+            # SQLite has a single writer, so rows are written here, one transaction each
+            outcome["markdown"], outcome["json"] = store.save_files(
+                outcome.pop("result"), jobs[i]["filename"], source_text=jobs[i]["article_text"],
+                version=version, image_path=jobs[i].get("image_path")
+            )
+        outcomes[i] = outcome
+
+    # Workers are started from pool.submit while other threads are inside model-client calls,
+    # so spawn them fresh instead of forking a copy of those threads' held locks
+    with ProcessPoolExecutor(max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        def network_stage(job: Dict[str, Any], save_if_passed: bool, cancel_token: Optional[CancelToken] = None):
+            raw_output = invoke_article_model(
+                job["article_text"], job.get("article_date"), job["filename"], job.get("author"),
+                llm, cancel_token, job.get("failed_check")
+            )
+            # Hand over only the raw text; the thread frees its slot without waiting on the CPU stage
+            return raw_output, pool.submit(postprocess_article, raw_output, job, save_if_passed, store is None)
+
+        controller = AdaptiveConcurrency(initial=min(2, workers), maximum=workers)
+        pending = list(range(len(jobs)))
+        for attempt in range(fidelity_retries + 1):
+            calls = run_adaptive(
+                [{"job": jobs[i], "save_if_passed": attempt == 0} for i in pending], controller,
+                worker=network_stage, cancel_token=cancel_token, job_timeout=job_timeout
+            )
+
+            retry = []
+            for i, call in zip(pending, calls):
+                if isinstance(call, Exception):
+                    outcomes[i] = call
+                    best.pop(i, None)
+                    continue
+                raw_output, future = call
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    outcomes[i] = e
+                    best.pop(i, None)
+                    continue
+                if outcome["saved"]:
+                    finish(i, outcome)
+                    continue
+                report = outcome["fidelity"]
+                if i not in best or attempt_rank(report) > attempt_rank(best[i][0]):
+                    best[i] = (report, raw_output)
+                if not report.passed:
+                    jobs[i] = dict(jobs[i], failed_check=report)
+                    retry.append(i)
+            pending = retry
+            if not pending:
+                break
+
+        saves = {i: pool.submit(save_article, raw_output, jobs[i], report, store is None)
+                 for i, (report, raw_output) in best.items()}
+        for i, future in saves.items():
+            try:
+                finish(i, future.result())
+            except Exception as e:
+                outcomes[i] = e
+
+    if store is not None:
+        return outcomes
+
+    # The index is shared by all workers, so it is only written from this process
+    saved = {job["filename"]: index_entry(version) for job, outcome in zip(jobs, outcomes)
+             if isinstance(outcome, dict) and outcome["saved"]}
+    if saved:
+        update_index(saved)
+
+    return outcomes
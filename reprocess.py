@@ -0,0 +1,169 @@
+# reprocess.py
+
+import sys
+import json
+import signal
+import argparse
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+from agent_processor import process_metadata, load_index, prompt_version, CancelToken, JobCancelled, JobExpired
+from concurrency import AdaptiveConcurrency, run_adaptive
+from pipeline import run_pipeline
+
+OUTPUT_DIR = Path("output")
+
+def find_stale(version: str, output_dir: Path = OUTPUT_DIR) -> List[str]:
+    """
+    Return the base filenames of outputs produced under another prompt version.
+    Only the index and the directory listing are read; outputs missing from the index count as stale.
+    """
+    index = load_index(output_dir)
+    bases = sorted(path.stem for path in Path(output_dir).glob("*.md"))
+    return [base for base in bases if index.get(base, {}).get("version") != version]
+
+def read_metadata(base: str, output_dir: Path = OUTPUT_DIR) -> Dict[str, Any]:
+    """Load the saved metadata of an output, empty if it has none."""
+    json_path = Path(output_dir) / f"{base}.json"
+    if not json_path.exists():
+        return {}
+    with open(json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def build_job(base: str, output_dir: Path = OUTPUT_DIR) -> Optional[Dict[str, Any]]:
+    """Rebuild the process_article arguments for an output, None if its source article wasn't kept."""
+    source_path = Path(output_dir) / f"{base}.txt"
+    if not source_path.exists():
+        return None
+    with open(source_path, "r", encoding="utf-8") as f:
+        article_text = f.read()
+
+    metadata = read_metadata(base, output_dir)
+    return {
+        "article_text": article_text,
+        "article_date": metadata.get("date"),
+        "filename": base,
+        "author": metadata.get("author"),
+        # Keep the image reference set when the output was first saved
+        "image": metadata.get("image")
+    }
+
+def describe_failure(error: Exception) -> str:
+    """Status text for a failed job, keeping cancelled and expired jobs apart from errors."""
+    if isinstance(error, JobExpired):
+        return "expired"
+    if isinstance(error, JobCancelled):
+        return "cancelled"
+    return f"error: {error}"
+
+def exit_code(status: Dict[str, str]) -> int:
+    """1 if any job failed, was cancelled or expired, else 0."""
+    return 1 if any(message.startswith(("error", "cancelled", "expired")) for message in status.values()) else 0
+
+def reprocess(bases: List[str], workers: int = 4, cpu_workers: Optional[int] = None, output_dir: Path = OUTPUT_DIR,
+              cancel_token: Optional[CancelToken] = None, job_timeout: Optional[float] = None) -> Dict[str, str]:
+    """Re-run the given outputs and save them under the current version. Returns a status per base filename."""
+    status = {}
+    jobs = []
+    for base in bases:
+        job = build_job(base, output_dir)
+        if job is None:
+            status[base] = "skipped: no source article"
+        else:
+            jobs.append(job)
+
+    outcomes = run_pipeline(jobs, workers, cpu_workers, cancel_token=cancel_token, job_timeout=job_timeout)
+
+    for job, outcome in zip(jobs, outcomes):
+        if isinstance(outcome, Exception):
+            status[job["filename"]] = describe_failure(outcome)
+        elif not outcome["fidelity"].passed:
+            status[job["filename"]] = "reprocessed (fidelity check failed)"
+        else:
+            status[job["filename"]] = "reprocessed"
+
+    return status
+
+def reindex_metadata(bases: List[str], batch_size: int = 5, workers: int = 4, output_dir: Path = OUTPUT_DIR,
+                     cancel_token: Optional[CancelToken] = None, job_timeout: Optional[float] = None) -> Dict[str, str]:
+    """
+    Regenerate only the title and description of existing outputs from their markdown,
+    several articles per request. Returns a status per base filename.
+    """
+    batches = []
+    for start in range(0, len(bases), batch_size):
+        markdowns = {}
+        for base in bases[start:start + batch_size]:
+            with open(Path(output_dir) / f"{base}.md", "r", encoding="utf-8") as f:
+                markdowns[base] = f.read()
+        batches.append({"markdowns": markdowns})
+
+    controller = AdaptiveConcurrency(initial=min(2, workers), maximum=workers)
+    results = run_adaptive(batches, controller, worker=process_metadata, cancel_token=cancel_token, job_timeout=job_timeout)
+
+    status = {}
+    for batch, result in zip(batches, results):
+        for base in batch["markdowns"]:
+            if isinstance(result, Exception):
+                status[base] = describe_failure(result)
+            elif base not in result:
+                status[base] = "error: missing from the model response"
+            else:
+                metadata = read_metadata(base, output_dir)
+                metadata['title'] = result[base].title
+                metadata['description'] = result[base].description
+                with open(Path(output_dir) / f"{base}.json", "w", encoding="utf-8") as f:
+                    json.dump(metadata, f, ensure_ascii=False, indent=2)
+                status[base] = "metadata updated"
+
+    return status
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-run outputs produced under an older prompt version.")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of concurrent model calls")
+    parser.add_argument("--cpu-workers", type=int, default=None, help="Processes for parsing and saving (default: one per core)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stale outputs")
+    parser.add_argument("--metadata-only", action="store_true", help="Only regenerate title and description of all outputs from their markdown")
+    parser.add_argument("--batch-size", type=int, default=5, help="Articles per request in metadata-only mode")
+    parser.add_argument("--timeout", type=float, default=None, help="Deadline in seconds for each model call")
+    parser.add_argument("names", nargs="*", help="Restrict to these output base filenames")
+    args = parser.parse_args(argv)
+
+    # Ctrl+C cancels the in-flight and queued jobs instead of killing the run
+    cancel_token = CancelToken()
+    signal.signal(signal.SIGINT, lambda signum, frame: cancel_token.cancel())
+
+    if args.metadata_only:
+        bases = sorted(path.stem for path in OUTPUT_DIR.glob("*.md"))
+        if args.names:
+            for name in args.names:
+                if name not in bases:
+                    print(f"{name}: skipped: no output")
+            bases = [name for name in args.names if name in bases]
+        if args.dry_run:
+            for base in bases:
+                print(f"{base}: would update metadata")
+            return 0
+        status = reindex_metadata(bases, args.batch_size, args.workers, cancel_token=cancel_token, job_timeout=args.timeout)
+        for base, message in status.items():
+            print(f"{base}: {message}")
+        return exit_code(status)
+
+    version = prompt_version()
+    stale = find_stale(version)
+    if args.names:
+        stale = [base for base in stale if base in args.names]
+    print(f"Current prompt version: {version}, {len(stale)} stale output(s)")
+
+    if args.dry_run:
+        for base in stale:
+            print(f"{base}: would reprocess" if build_job(base) else f"{base}: skipped: no source article")
+        return 0
+
+    status = reprocess(stale, args.workers, args.cpu_workers, cancel_token=cancel_token, job_timeout=args.timeout)
+    for base, message in status.items():
+        print(f"{base}: {message}")
+    return exit_code(status)
+
+if __name__ == "__main__":
+    sys.exit(main())
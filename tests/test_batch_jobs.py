@@ -0,0 +1,55 @@
+import os
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_google_genai")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+
+from batch_jobs import export_batch_requests, ingest_batch_results, _read_jsonl
+
+ARTICLES = [
+    {"text": "نص المقالة الأولى", "filename": "first", "author": "كاتب", "date": "2024-05-01"},
+    {"text": "نص المقالة الثانية", "filename": "second"}
+]
+
+def result_line(key, markdown, metadata):
+    text = json.dumps({"markdown": markdown, "json_metadata": metadata, "user_queries": []}, ensure_ascii=False)
+    return {"key": key, "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]}}
+
+def test_export_and_ingest_offline(tmp_path, monkeypatch):
+    # Export reads the few-shot examples from data/, so it runs from the repository root
+    monkeypatch.chdir(Path(__file__).resolve().parent.parent)
+    requests_path = tmp_path / "requests.jsonl"
+    manifest = export_batch_requests(ARTICLES, requests_path)
+    requests = _read_jsonl(requests_path)
+    assert [entry["key"] for entry in _read_jsonl(manifest)] == [request["key"] for request in requests]
+    assert "نص المقالة الأولى" in requests[0]["request"]["contents"][0]["parts"][0]["text"]
+
+    first, second = (request["key"] for request in requests)
+    results_path = tmp_path / "results.jsonl"
+    lines = [
+        # The model made up a date and left an empty value, clean_metadata must fix both
+        result_line(first, "# نص المقالة الأولى", {"title": "عنوان", "date": "1999-01-01", "description": " "}),
+        {"key": second, "error": {"code": 400, "message": "Invalid request"}},
+        result_line("unknown", "نص", {"title": "عنوان"})
+    ]
+    with open(results_path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    monkeypatch.chdir(tmp_path)
+    report = ingest_batch_results(results_path, requests_path)
+
+    assert list(report["saved"]) == [first]
+    assert set(report["errors"]) == {second, "unknown"}
+    assert "Invalid request" in report["errors"][second]
+
+    output_dir = tmp_path / "output"
+    assert (output_dir / "first.md").read_text(encoding="utf-8") == "# نص المقالة الأولى"
+    assert (output_dir / "first.txt").read_text(encoding="utf-8") == "نص المقالة الأولى"
+    metadata = json.loads((output_dir / "first.json").read_text(encoding="utf-8"))
+    assert metadata == {"title": "عنوان", "date": "2024-05-01", "author": "كاتب", "filename": "first"}
+    assert "first" in json.loads((output_dir / "index.json").read_text(encoding="utf-8"))
+    assert not (output_dir / "second.md").exists()
@@ -0,0 +1,66 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from cancellation import CancelToken, JobCancelled, JobExpired, POLL_INTERVAL, invoke_with_token
+
+class SyncChain:
+    """Sync model call; ainvoke runs it on the loop's default executor like a sync langchain runnable."""
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, inputs):
+        time.sleep(self.latency)
+        return "done"
+
+    async def ainvoke(self, inputs):
+        return await asyncio.get_running_loop().run_in_executor(None, self.invoke, inputs)
+
+class AsyncChain:
+    def __init__(self, latency):
+        self.latency = latency
+        self.aborted = False
+
+    async def ainvoke(self, inputs):
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.aborted = True
+            raise
+        return "done"
+
+# Slack on top of the polling interval for thread scheduling
+MARGIN = 0.2
+
+def test_expired_sync_call_returns_within_poll_interval():
+    start = time.monotonic()
+    with pytest.raises(JobExpired):
+        invoke_with_token(SyncChain(3.0), {}, CancelToken(timeout=0.1))
+    assert time.monotonic() - start < 0.1 + POLL_INTERVAL + MARGIN
+
+def test_cancelled_sync_call_returns_within_poll_interval():
+    token = CancelToken()
+    threading.Timer(0.1, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(JobCancelled) as excinfo:
+        invoke_with_token(SyncChain(3.0), {}, token)
+    assert not isinstance(excinfo.value, JobExpired)
+    assert time.monotonic() - start < 0.1 + POLL_INTERVAL + MARGIN
+
+def test_cancelled_async_call_is_aborted():
+    chain = AsyncChain(3.0)
+    with pytest.raises(JobExpired):
+        invoke_with_token(chain, {}, CancelToken(timeout=0.1))
+    assert chain.aborted
+
+def test_finished_call_returns_result():
+    assert invoke_with_token(SyncChain(0.01), {}, CancelToken(timeout=5)) == "done"
+
+def test_child_token_follows_parent():
+    parent = CancelToken()
+    child = CancelToken(parent=parent)
+    parent.cancel()
+    with pytest.raises(JobCancelled):
+        child.check()
@@ -0,0 +1,108 @@
+import heapq
+
+from concurrency import AdaptiveConcurrency, is_overload_error, percentile
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class ScriptedModel:
+    """
+    Fake model with a time-varying quota: a call started while more calls are in flight
+    than quota(now) allows fails fast with a 429, otherwise it takes latency(now, concurrency).
+    """
+    def __init__(self, quota, latency, overload_latency=0.2):
+        self.quota = quota
+        self.latency = latency
+        self.overload_latency = overload_latency
+
+    def start(self, now, concurrency):
+        if concurrency > self.quota(now):
+            return self.overload_latency, RuntimeError("429 Resource exhausted")
+        return self.latency(now, concurrency), None
+
+def simulate(controller, model, clock, calls):
+    """Drive the controller on the fake clock: start calls while slots are free, advance to the next finish."""
+    in_flight = []
+    started = 0
+    while started < calls or in_flight:
+        while started < calls and controller.try_acquire():
+            latency, error = model.start(clock.now, len(in_flight) + 1)
+            heapq.heappush(in_flight, (clock.now + latency, started, clock.now, controller.generation, error))
+            started += 1
+        finish, _, start, generation, error = heapq.heappop(in_flight)
+        clock.now = finish
+        controller.release(finish - start, error, generation=generation)
+
+# AIMD sawtooth under the quota of 4, then climbing to the quota of 8 once it is raised at t=20
+EXPECTED_HISTORY = [
+    (2, "initial"), (3, "healthy"), (4, "healthy"), (5, "healthy"), (2, "overload"),
+    (3, "healthy"), (4, "healthy"), (5, "healthy"), (2, "overload"),
+    (3, "healthy"), (4, "healthy"), (5, "healthy"), (2, "overload"),
+    (3, "healthy"), (4, "healthy"), (5, "healthy"), (6, "healthy"), (7, "healthy"), (8, "healthy"),
+    (9, "healthy"), (10, "healthy"), (5, "overload"),
+    (6, "healthy"), (7, "healthy"), (8, "healthy"), (9, "healthy"), (4, "overload"),
+    (5, "healthy"), (6, "healthy"),
+]
+
+def limits(controller):
+    return [(limit, reason) for _, limit, reason in controller.metrics()["history"]]
+
+def test_follows_time_varying_quota():
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=2, maximum=16, window=4, clock=clock)
+    model = ScriptedModel(quota=lambda now: 4 if now < 20 else 8, latency=lambda now, concurrency: 1.0)
+
+    simulate(controller, model, clock, 120)
+
+    assert limits(controller) == EXPECTED_HISTORY
+
+def test_latency_curve_cuts_limit():
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=4, maximum=16, window=4, latency_target=2.0, clock=clock)
+    # No quota, but latency grows with concurrency past 6 calls
+    model = ScriptedModel(quota=lambda now: 100, latency=lambda now, concurrency: 1.0 if concurrency <= 6 else 3.0)
+
+    simulate(controller, model, clock, 80)
+
+    reasons = [reason for _, reason in limits(controller)]
+    assert "latency" in reasons
+    assert max(limit for limit, _ in limits(controller)) <= 8
+
+def test_burst_of_429s_cuts_once():
+    clock = FakeClock()
+    controller = AdaptiveConcurrency(initial=16, maximum=16, window=4, clock=clock)
+    # Quota drops to 1: every call already in flight comes back as a 429
+    model = ScriptedModel(quota=lambda now: 1, latency=lambda now, concurrency: 1.0)
+
+    simulate(controller, model, clock, 16)
+
+    assert limits(controller)[:2] == [(16, "initial"), (8, "overload")]
+
+def test_user_errors_do_not_count_as_overload():
+    controller = AdaptiveConcurrency(initial=4, window=10)
+    controller.record(1.0, ValueError("bad json"))
+    assert controller.limit == 4
+
+class ResourceExhausted(Exception):
+    code = 429
+
+def test_overload_is_classified_by_type_and_status():
+    assert is_overload_error(TimeoutError())
+    assert is_overload_error(ResourceExhausted("Quota exceeded"))
+    assert is_overload_error(RuntimeError("429 Resource exhausted"))
+    wrapped = RuntimeError("Error calling model")
+    wrapped.__cause__ = ResourceExhausted("Quota exceeded")
+    assert is_overload_error(wrapped)
+
+def test_parser_error_quoting_overload_words_is_not_overload():
+    error = ValueError('Failed to parse ArticleOutput from completion {"markdown": "API quota and timeout, 429 deadline"}')
+    assert not is_overload_error(error)
+
+def test_percentile_nearest_rank():
+    assert percentile([], 0.95) == 0.0
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile(list(range(1, 101)), 0.95) == 95
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from fidelity import FidelityReport, attempt_rank, check_fidelity, describe_failures
+
+SOURCE = "\n".join(f"سطر رقم {i} فيه كلام كتير عن الموضوع ده" for i in range(20))
+
+def test_full_conversion_passes():
+    markdown = "## عنوان\n\n" + SOURCE.replace("سطر", "**سطر**")
+    assert check_fidelity(SOURCE, markdown).passed
+
+def test_cut_conversion_fails():
+    report = check_fidelity(SOURCE, SOURCE[:len(SOURCE) // 3])
+    assert not report.passed
+    assert describe_failures(report)
+
+def test_failure_without_dropped_paragraphs_is_described():
+    report = FidelityReport(coverage=0.95, tail_coverage=0.9, length_ratio=0.5, dropped_paragraphs=[], passed=False)
+    assert describe_failures(report) == ["it was only 50% of the original length"]
+
+def test_passing_attempt_beats_higher_coverage(monkeypatch):
+    pytest.importorskip("langchain_google_genai")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    from agent_processor import process_article
+
+    # Distinct words per paragraph, so dropping a paragraph shows in the tail and paragraph checks
+    source = "\n".join(" ".join(f"word{i}x{j}" for j in range(12)) for i in range(20))
+    lines = source.splitlines()
+    truncated = "\n".join(lines[:-2])
+    complete = "\n".join(line.rsplit(" ", 2)[0] for line in lines)
+    assert not check_fidelity(source, truncated).passed
+    assert check_fidelity(source, complete).passed
+    assert check_fidelity(source, truncated).coverage > check_fidelity(source, complete).coverage
+
+    responses = iter([truncated, complete])
+    def llm(prompt):
+        return json.dumps({"markdown": next(responses), "json_metadata": {"title": "t"}, "user_queries": []})
+
+    result = process_article(source, filename="article", llm=llm)
+    assert result.markdown == complete
+
+def test_attempt_rank_prefers_passing():
+    failed = FidelityReport(coverage=0.9, tail_coverage=0.5, length_ratio=0.9, dropped_paragraphs=["a", "b"], passed=False)
+    passed = FidelityReport(coverage=0.8, tail_coverage=0.8, length_ratio=0.8, dropped_paragraphs=[], passed=True)
+    assert max([failed, passed], key=attempt_rank) is passed